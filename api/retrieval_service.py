@@ -0,0 +1,55 @@
+# Shared retrieval service
+#
+# Multi-worker deployments each build their own EmbeddingManager — their
+# own Chroma client, model weights and caches. Running this service once
+# and pointing workers at it shares a single warm index and cache instead.
+#
+# Run with: uvicorn api.retrieval_service:app --port 8001
+# Point workers at it with RETRIEVAL_SERVICE_URL=http://host:8001;
+# backend.retrieval then POSTs here instead of loading its own manager.
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from backend.retrieval import retrieve_relevant_chunks, retrieve_relevant_chunks_batch
+
+app = FastAPI(title="Research Paper Copilot - Retrieval Service")
+
+
+class RetrievalRequest(BaseModel):
+    query: str
+    top_k: int = 5
+    max_context_tokens: int = 2000
+
+
+class BatchRetrievalRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    max_context_tokens: int = 2000
+
+
+def _serialize(context_data: Dict) -> Dict:
+    # query_embedding is a numpy array and only useful in-process
+    return {key: value for key, value in context_data.items() if key != 'query_embedding'}
+
+
+@app.post("/retrieve")
+def retrieve(request: RetrievalRequest):
+    """Retrieve formatted context for one query"""
+    return _serialize(retrieve_relevant_chunks(
+        request.query, request.top_k, max_context_tokens=request.max_context_tokens
+    ))
+
+
+@app.post("/retrieve_batch")
+def retrieve_batch(request: BatchRetrievalRequest):
+    """Retrieve formatted contexts for many queries in one call"""
+    return [_serialize(c) for c in retrieve_relevant_chunks_batch(
+        request.queries, request.top_k, max_context_tokens=request.max_context_tokens
+    )]
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
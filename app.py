@@ -1,15 +1,55 @@
 # app.py
+import asyncio
 import streamlit as st
 import tempfile
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from backend.ingest import process_file
+from backend.ingest import ingest_file
 from backend.embeddings import EmbeddingManager
 from backend.rag_pipelines import answer_question_with_citations
 import warnings
 
 warnings.filterwarnings("ignore")
 
+
+@st.cache_resource
+def get_embedding_manager():
+    """One shared EmbeddingManager across all sessions and reruns"""
+    return EmbeddingManager()
+
+
+async def _parse_uploads(pending, progress_cb):
+    """Parse saved uploads concurrently, reporting progress as each finishes.
+
+    Worker processes do the CPU-bound PDF parse; the async layer bounds
+    concurrency and lets completed files surface immediately instead of
+    blocking on the slowest upload.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(4)
+    results = []
+
+    with ProcessPoolExecutor(max_workers=_ingest_workers()) as executor:
+        async def parse_one(item):
+            async with semaphore:
+                return await loop.run_in_executor(executor, ingest_file, item)
+
+        tasks = [asyncio.ensure_future(parse_one(item)) for item in pending]
+        for i, task in enumerate(asyncio.as_completed(tasks)):
+            results.append(await task)
+            progress_cb(i + 1, len(pending))
+
+    return results
+
+
+def _ingest_workers():
+    """Worker count for parallel PDF parsing, overridable via env"""
+    configured = os.getenv("LOAD_DOCUMENTS_NUMBER_OF_THREADS", "")
+    if configured.isdigit() and int(configured) > 0:
+        return int(configured)
+    return max(1, (os.cpu_count() or 2) - 1)
+
 # Page configuration
 st.set_page_config(
     page_title="Research Paper Copilot",
@@ -25,8 +65,7 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "processed_files" not in st.session_state:
     st.session_state.processed_files = []
-if "embedding_manager" not in st.session_state:
-    st.session_state.embedding_manager = EmbeddingManager()
+st.session_state.embedding_manager = get_embedding_manager()
 
 # Sidebar for file upload and settings
 with st.sidebar:
@@ -60,35 +99,50 @@ with st.sidebar:
         if st.button("🚀 Process Papers", type="primary"):
             progress_bar = st.progress(0)
             status_text = st.empty()
-            
-            for i, uploaded_file in enumerate(uploaded_files):
+
+            # Save pending uploads to temp files first so workers can read them
+            pending = []
+            for uploaded_file in uploaded_files:
                 if uploaded_file.name not in st.session_state.processed_files:
-                    try:
-                        status_text.text(f"Processing {uploaded_file.name}...")
-                        
-                        # Save uploaded file temporarily
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                            tmp_file.write(uploaded_file.getvalue())
-                            tmp_path = tmp_file.name
-                        
-                        # Process file through your pipeline
-                        processed_doc = process_file(tmp_path)
-                        doc_id = st.session_state.embedding_manager.add_document(processed_doc)
-                        
+                    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+                        tmp_file.write(uploaded_file.getvalue())
+                        pending.append((uploaded_file.name, tmp_file.name))
+
+            if pending:
+                status_text.text(f"Processing {len(pending)} file(s)...")
+
+                # PDF parsing and chunking run in parallel worker processes,
+                # orchestrated with asyncio; embedding + Chroma writes stay
+                # serial on the main process
+                parse_results = asyncio.run(_parse_uploads(
+                    pending,
+                    lambda done, total: progress_bar.progress(done / total)
+                ))
+
+                parsed = []
+                for filename, tmp_path, processed_doc, error in parse_results:
+                    if error is not None:
+                        st.error(f"Error processing {filename}: {error}")
+                    else:
+                        parsed.append((filename, processed_doc))
+
+                    # Cleanup
+                    os.unlink(tmp_path)
+
+                # Embed every parsed file's chunks in one combined batch
+                if parsed:
+                    status_text.text("Embedding and indexing...")
+                    doc_ids = st.session_state.embedding_manager.add_documents_bulk(
+                        [processed_doc for _, processed_doc in parsed]
+                    )
+
+                    for (filename, _), doc_id in zip(parsed, doc_ids):
                         if doc_id:
-                            st.session_state.processed_files.append(uploaded_file.name)
-                            st.success(f"✅ Processed: {uploaded_file.name}")
+                            st.session_state.processed_files.append(filename)
+                            st.success(f"✅ Processed: {filename}")
                         else:
-                            st.error(f"❌ Failed to process: {uploaded_file.name}")
-                        
-                        # Cleanup
-                        os.unlink(tmp_path)
-                        
-                    except Exception as e:
-                        st.error(f"Error processing {uploaded_file.name}: {str(e)}")
-                
-                progress_bar.progress((i + 1) / len(uploaded_files))
-            
+                            st.error(f"❌ Failed to process: {filename}")
+
             status_text.text("Processing complete!")
             st.rerun()
 
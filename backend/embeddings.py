@@ -1,125 +1,821 @@
 from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+import asyncio
+import contextlib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
 from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
 from backend.ingest import smart_chunking
-import time 
 from backend import config
 
+
+class _OnnxEncoder:
+    """Drop-in replacement for SentenceTransformer.encode backed by ONNX Runtime.
+
+    Expects a directory produced by:
+        optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 --optimize O3 <dir>
+    Runs the fused/constant-folded graph with all graph optimizations enabled,
+    then mean-pools and (optionally) L2-normalizes in NumPy.
+    """
+
+    def __init__(self, model_dir):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        sess_opts = ort.SessionOptions()
+        sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        sess_opts.intra_op_num_threads = os.cpu_count() or 1
+
+        # Prefer an int8-quantized export (e.g. ORTQuantizer with
+        # avx512_vnni dynamic config) when one sits next to the FP32 model
+        model_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, "model.onnx")
+
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=sess_opts,
+            providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.input_names = {inp.name for inp in self.session.get_inputs()}
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False,
+               convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        """Encode texts, matching the SentenceTransformer.encode signature"""
+        if isinstance(texts, str):
+            texts = [texts]
+
+        all_embeddings = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            # Dynamic padding: each batch only pads to its own longest sequence
+            encoded = self.tokenizer(batch, padding=True, truncation=True, return_tensors="np")
+            inputs = {k: v for k, v in encoded.items() if k in self.input_names}
+
+            token_embeddings = self.session.run(None, inputs)[0]
+
+            # Mean pooling over non-padding tokens
+            mask = encoded['attention_mask'][..., np.newaxis].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            counts = mask.sum(axis=1).clip(min=1e-9)
+            all_embeddings.append(summed / counts)
+
+        embeddings = np.vstack(all_embeddings)
+        if normalize_embeddings:
+            embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True).clip(min=1e-12)
+        return embeddings
+
+
+def _tune_torch_threads():
+    """Size PyTorch's intra-op thread pool to the machine.
+
+    PyTorch can default to a single MKL thread under Streamlit's import
+    order, leaving GEMM-bound MiniLM encoding on one core. Must run before
+    the SentenceTransformer is constructed.
+    """
+    n = max(1, (os.cpu_count() or 2) - 1)
+    os.environ.setdefault("OMP_NUM_THREADS", str(n))
+    os.environ.setdefault("MKL_NUM_THREADS", str(n))
+    try:
+        import torch
+        torch.set_num_threads(n)
+        torch.set_num_interop_threads(1)
+    except Exception as e:
+        # set_num_interop_threads raises if parallel work already started
+        print(f"Could not tune torch threads: {e}")
+
+
+def _pick_device():
+    """Pick the fastest available device for the encoder"""
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return "cuda"
+        if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+            return "mps"
+    except Exception:
+        pass
+    return "cpu"
+
+
+def _inference_ctx():
+    """Context manager that disables autograd bookkeeping when torch is present"""
+    try:
+        import torch
+        return torch.inference_mode()
+    except Exception:
+        return contextlib.nullcontext()
+
+
+def _load_encoder(model_name):
+    """Load the ONNX encoder if an exported model is available, else PyTorch"""
+    onnx_dir = os.getenv("ONNX_MODEL_DIR", "")
+    if onnx_dir and any(
+        os.path.exists(os.path.join(onnx_dir, name))
+        for name in ("model_quantized.onnx", "model.onnx")
+    ):
+        try:
+            encoder = _OnnxEncoder(onnx_dir)
+            print(f"Using ONNX Runtime encoder from {onnx_dir}")
+            return encoder
+        except Exception as e:
+            print(f"Falling back to PyTorch encoder (ONNX load failed: {e})")
+    _tune_torch_threads()
+    model = SentenceTransformer(model_name, device=_pick_device())
+    if os.getenv("EMBEDDING_INT8", "").lower() in ("1", "true", "yes"):
+        model = _quantize_int8(model)
+    else:
+        model = _compile_encoder(model)
+    return model
+
+
+def _compile_encoder(model):
+    """Fuse the transformer forward with torch.compile where supported.
+
+    dynamic=True keeps variable batch/sequence lengths from smart batching
+    from re-triggering compilation.
+    """
+    try:
+        import torch
+        model[0].auto_model = torch.compile(
+            model[0].auto_model, mode="reduce-overhead", dynamic=True
+        )
+    except Exception:
+        pass  # older torch or unsupported backend; eager mode is fine
+    return model
+
+
+def _quantize_int8(model):
+    """Apply int8 dynamic quantization to the transformer's linear layers.
+
+    Halves memory bandwidth and uses VNNI/AVX2 int8 GEMM kernels on CPU.
+    Safe for retrieval because generate_embeddings L2-normalizes outputs.
+    """
+    try:
+        import torch
+        model[0].auto_model = torch.quantization.quantize_dynamic(
+            model[0].auto_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        print("Embedding model quantized to int8 (dynamic)")
+    except Exception as e:
+        print(f"int8 quantization unavailable, keeping FP32: {e}")
+    return model
+
+
+class _EmbeddingCache:
+    """On-disk key-value cache of chunk embeddings, keyed by content hash.
+
+    A cache hit skips the transformer forward entirely, so re-ingesting the
+    same (or near-identical) chunk text is effectively free.
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(db_path, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(db_path, "emb_cache.sqlite3"), check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS ingest_cache (fingerprint TEXT PRIMARY KEY, doc_id TEXT NOT NULL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "doc_id TEXT PRIMARY KEY, filename TEXT, page_count INTEGER, ingested_at INTEGER)"
+        )
+        self.conn.commit()
+
+    def get_many(self, keys):
+        """Return {key: vector} for every cached key"""
+        found = {}
+        for key in keys:
+            row = self.conn.execute("SELECT vec FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                found[key] = np.frombuffer(row[0], dtype=np.float32)
+        return found
+
+    def set_many(self, items):
+        """Store {key: vector} entries"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+            [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items.items()]
+        )
+        self.conn.commit()
+
+    def record_document(self, doc_id, filename, page_count):
+        """Register an ingested document for O(limit) listing"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO documents (doc_id, filename, page_count, ingested_at) VALUES (?, ?, ?, ?)",
+            (doc_id, filename, page_count, int(time.time()))
+        )
+        self.conn.commit()
+
+    def list_documents(self, limit):
+        """Most recently ingested documents, newest first"""
+        rows = self.conn.execute(
+            "SELECT doc_id, filename, page_count, ingested_at FROM documents "
+            "ORDER BY ingested_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [
+            {'doc_id': r[0], 'filename': r[1], 'page_count': r[2], 'ingested_at': r[3]}
+            for r in rows
+        ]
+
+    def get_ingested_doc_id(self, fingerprint):
+        """Return the doc_id a file fingerprint was previously ingested as"""
+        row = self.conn.execute(
+            "SELECT doc_id FROM ingest_cache WHERE fingerprint = ?", (fingerprint,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def set_ingested_doc_id(self, fingerprint, doc_id):
+        """Record that a file fingerprint has been ingested as doc_id"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ingest_cache (fingerprint, doc_id) VALUES (?, ?)",
+            (fingerprint, doc_id)
+        )
+        self.conn.commit()
+
+
 class EmbeddingManager:
     def __init__(self, model_name: str = "all-MiniLM-L6-v2", db_path: str = None):
         """Initialize embedding model and vector store"""
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
+        self.model = _load_encoder(model_name)
 
         self.vector_store = db_path or config.DB_PATH  
         
         print("EmbeddingManager is using vector store at:", self.vector_store)
 
+        try:
+            self.cache = _EmbeddingCache(self.vector_store)
+        except Exception as e:
+            print(f"Embedding cache unavailable: {e}")
+            self.cache = None
 
-        self.client = chromadb.PersistentClient(path=self.vector_store)
+        # Query caches: exact-match LRU for embeddings, plus a small semantic
+        # cache that reuses results for near-duplicate queries. One manager
+        # is shared across Streamlit session threads, so mutations are
+        # serialized by a lock (never held across an encode call).
+        self._cache_lock = threading.Lock()
+        self._query_lru = OrderedDict()
+        self._query_lru_maxsize = 512
+        self._semantic_cache = []
+        self._semantic_cache_maxsize = 128
+        self._semantic_threshold = 0.95
+        self._semantic_ttl = 300  # seconds
+
+        # Async collection is created lazily by _get_async_collection
+        self._async_collection = None
 
-        self.collection = self.client.get_or_create_collection(
-            name="ai_research_paper",
-            metadata={"description": "AI White paper documents"}
-        )
+
+        self.client = None
+        backend = os.getenv("VECTOR_BACKEND", "chroma").lower()
+
+        if backend == "faiss":
+            # FAISS HNSW backend for large corpora (opened writable here;
+            # query-only processes can use FaissStore(read_only=True) to mmap)
+            try:
+                from backend.vector_store import FaissStore
+                self.collection = FaissStore(self.vector_store)
+            except Exception as e:
+                print(f"FAISS backend unavailable ({e}), falling back to Chroma")
+                backend = "chroma"
+
+        if backend == "chroma":
+            self.client = chromadb.PersistentClient(path=self.vector_store)
+
+            # HNSW settings: every stored/query vector is L2-normalized, so
+            # inner product equals cosine and skips the per-comparison norm;
+            # `1 - distance` stays a true cosine similarity. Graph parameters
+            # are tuned for recall at the 5-10 result range.
+            self.collection = self.client.get_or_create_collection(
+                name="ai_research_paper",
+                metadata={
+                    "description": "AI White paper documents",
+                    "hnsw:space": "ip",
+                    "hnsw:M": 32,
+                    "hnsw:construction_ef": 200,
+                    "hnsw:search_ef": 100
+                }
+            )
+
+            # get_or_create_collection ignores metadata for a collection
+            # that already exists, so a store created before the ip switch
+            # silently stays on L2 — and `1 - distance` is then not a
+            # cosine. Surface that loudly so the operator re-ingests.
+            actual_space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+            if actual_space != "ip":
+                print(
+                    f"Warning: existing collection uses hnsw:space='{actual_space}', "
+                    "not 'ip'. Similarity scores and the min_similarity cutoff will "
+                    "be wrong; delete the collection (or the vector store directory) "
+                    "and re-ingest to rebuild it with the ip space."
+                )
 
     def generate_embeddings(self, texts):
-        """Generate embeddings for a list of texts"""
-        embeddings = self.model.encode(texts)
-        return embeddings
+        """Generate embeddings for a list of texts, reusing cached vectors when possible"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        if self.cache is None:
+            return self._encode(texts)
+
+        # Look up each chunk by content hash and only encode the misses
+        keys = [self._cache_key(t) for t in texts]
+        cached = self.cache.get_many(keys)
+
+        misses = [(i, t) for i, (key, t) in enumerate(zip(keys, texts)) if key not in cached]
+        if misses:
+            new_embeddings = self._encode([t for _, t in misses])
+            self.cache.set_many({keys[i]: emb for (i, _), emb in zip(misses, new_embeddings)})
+            miss_map = {i: emb for (i, _), emb in zip(misses, new_embeddings)}
+        else:
+            miss_map = {}
+
+        return np.vstack([
+            miss_map[i] if i in miss_map else cached[keys[i]]
+            for i in range(len(texts))
+        ])
+
+    def _cache_key(self, text):
+        """Content hash identifying one chunk's embedding, namespaced by model"""
+        return hashlib.sha256((self.model_name + text).encode()).digest()
+
+    def _encode(self, texts):
+        """Encode texts using length-sorted smart batching"""
+        # Sort by length so each batch pads to its own longest sequence,
+        # not the longest in the whole list (SBERT smart batching)
+        lengths = [len(t) for t in texts]
+        order = np.argsort(lengths)
+
+        # Accelerators amortize launch overhead over larger batches
+        device = str(getattr(self.model, "device", "cpu"))
+        batch_size = 64 if device == "cpu" else 128
+
+        with _inference_ctx():
+            embeddings = self.model.encode(
+                [texts[i] for i in order],
+                batch_size=batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+
+        # Restore original order
+        inv = np.empty_like(order)
+        inv[order] = np.arange(len(order))
+        return embeddings[inv]
     
-    def store_chunks(self, chunks, doc_metadata, doc_id):
+    def store_chunks(self, chunks, doc_metadata, doc_id, embeddings=None):
         """Store chunks with embeddings and metadata in vector database"""
         try:
-            #extracting texts from chunks and generating embeddings    
-            texts = [chunk['content'] for chunk in chunks]
-            embeddings = self.generate_embeddings(texts)    
-                
-            #Prepare data from Chromadb
-            documents = []
-            chunk_metadata_list = []
-            ids = []
-
-            for i, chunk in enumerate(chunks):
-                documents.append(chunk['content'])
-                ids.append(f"{doc_id}_chunk_{i}")
-                chunk_metadata_list.append({
-                    'filename': doc_metadata['filename'], 
-                    'doc_id': doc_id,
-                    'page_number': chunk.get('page_number', None),
-                    'title': doc_metadata.get('title', ''),
-                    'chunk_id': i,
-                    'length': chunk['length'],
-                    'topic': 'ai research papers'
-                })
-                
-            #Add details to the ChromaDB
+            #extracting texts from chunks and generating embeddings
+            #(unless the caller already embedded them in a combined batch)
+            if embeddings is None:
+                embeddings = self.generate_embeddings(chunks['content'])
+
+            # Halve storage and distance-computation bandwidth; unit-norm
+            # MiniLM vectors lose no retrieval accuracy at half precision
+            embeddings = np.asarray(embeddings).astype(np.float16)
+
+
+            documents, chunk_metadata_list, ids = self._build_rows(chunks, doc_metadata, doc_id)
+            self._write_rows(documents, chunk_metadata_list, ids, embeddings)
+            return True
+        except Exception as e:
+            print(f"Error storing chunks: {e}")
+            return False
+
+    def _build_rows(self, chunks, doc_metadata, doc_id):
+        """Marshal one document's columnar chunks into parallel Chroma row lists
+        (shared fields hoisted, one zip instead of per-chunk dict reads)"""
+        filename = doc_metadata['filename']
+        title = doc_metadata.get('title', '')
+
+        documents = chunks['content']
+        lengths = chunks['length']
+        page_numbers = chunks.get('page_number') or [None] * len(documents)
+
+        ids = [_chunk_id(filename, i, content) for i, content in enumerate(documents)]
+        chunk_metadata_list = [
+            {
+                'filename': filename,
+                'doc_id': doc_id,
+                'page_number': page_number,
+                'title': title,
+                'chunk_id': i,
+                'length': length,
+                'topic': 'ai research papers'
+            }
+            for i, (page_number, length) in enumerate(zip(page_numbers, lengths))
+        ]
+        return documents, chunk_metadata_list, ids
+
+    def _write_rows(self, documents, metadatas, ids, embeddings):
+        """Write one batch of rows to ChromaDB; upsert is idempotent for our
+        content-addressed ids, so re-ingesting a file updates rows instead
+        of duplicating"""
+        try:
+            self.collection.upsert(
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids,
+                embeddings=embeddings
+            )
+        except AttributeError:
+            # older chromadb without upsert
             self.collection.add(
                 documents=documents,
-                metadatas=chunk_metadata_list,
+                metadatas=metadatas,
                 ids=ids,
                 embeddings=embeddings
             )
-            return True
-        except Exception as e:
-            print(f"Error storing chunks: {e}")
-            return False
+
+    def prepare_document(self, processed_document):
+        """Unpack a processed document and assign its ID, without embedding"""
+        chunks = processed_document['content']
+        doc_metadata = processed_document['metadata']
+        doc_id = _generate_doc_id(doc_metadata['filename'])
+        return doc_id, chunks, doc_metadata
+
+    def _cached_doc_id(self, doc_metadata):
+        """Look up a previously ingested doc_id by file fingerprint"""
+        fingerprint = doc_metadata.get('fingerprint')
+        if self.cache is None or not fingerprint:
+            return None
+        return self.cache.get_ingested_doc_id(fingerprint)
+
+    def _remember_ingest(self, doc_metadata, doc_id):
+        if self.cache is None:
+            return
+        self.cache.record_document(
+            doc_id, doc_metadata.get('filename', ''), doc_metadata.get('page_count')
+        )
+        fingerprint = doc_metadata.get('fingerprint')
+        if fingerprint:
+            self.cache.set_ingested_doc_id(fingerprint, doc_id)
 
     def add_document(self, processed_document):
         """Main function to add a processed document from ingest pipeline"""
         try:
-            # Extract content and metadata from processed document
-            chunks = processed_document['content']
-            doc_metadata = processed_document['metadata']
-            
-            # Generate document ID
-            doc_id = _generate_doc_id(doc_metadata['filename'])
-            
+            doc_id, chunks, doc_metadata = self.prepare_document(processed_document)
+
+            # Skip the whole pipeline for byte-identical files seen before
+            cached_doc_id = self._cached_doc_id(doc_metadata)
+            if cached_doc_id is not None:
+                print(f"File already ingested as {cached_doc_id}, skipping re-embed")
+                return cached_doc_id
+
             # Store chunks with embeddings
             success = self.store_chunks(chunks, doc_metadata, doc_id)
-            
+
             if success:
+                self._remember_ingest(doc_metadata, doc_id)
                 return doc_id
             else:
                 return None
         except Exception as e:
             print(f"Error adding document: {e}")
             return None
+
+    def add_documents_bulk(self, processed_documents, batch_size=200):
+        """Add several processed documents with one combined encode call.
+
+        Embedding all chunks across all queued files in a single batch
+        amortizes per-call dispatch/padding overhead, and rows from all
+        documents are written to Chroma in fixed-size batches rather than
+        one transaction per document. Returns one doc_id (or None) per
+        input document.
+        """
+        prepared = []
+        cached_ids = {}
+        all_texts = []
+        for doc_index, processed_document in enumerate(processed_documents):
+            try:
+                doc_id, chunks, doc_metadata = self.prepare_document(processed_document)
+
+                # Byte-identical files seen before skip embedding entirely
+                cached_doc_id = self._cached_doc_id(doc_metadata)
+                if cached_doc_id is not None:
+                    print(f"File already ingested as {cached_doc_id}, skipping re-embed")
+                    cached_ids[doc_index] = cached_doc_id
+                    prepared.append(None)
+                    continue
+
+                # Validate before mutating either list, so a malformed
+                # document contributes exactly one None and nothing else
+                texts = chunks['content']
+                if not isinstance(texts, list):
+                    raise TypeError(
+                        f"chunks['content'] must be a list of strings, got {type(texts).__name__}"
+                    )
+
+                all_texts.extend(texts)
+                prepared.append((doc_id, chunks, doc_metadata))
+            except Exception as e:
+                print(f"Error preparing document: {e}")
+                prepared.append(None)
+
+        embeddings = np.asarray(self.generate_embeddings(all_texts)).astype(np.float16)
+
+        # Marshal every document's rows, remembering which document each
+        # row belongs to so write failures can be attributed
+        rows = []  # (doc_index, document, metadata, id, embedding)
+        offset = 0
+        for doc_index, item in enumerate(prepared):
+            if item is None:
+                continue
+            doc_id, chunks, doc_metadata = item
+            n_chunks = len(chunks['content'])
+            try:
+                documents, metadatas, ids = self._build_rows(chunks, doc_metadata, doc_id)
+            except Exception as e:
+                print(f"Error marshaling document {doc_id}: {e}")
+                prepared[doc_index] = None
+                offset += n_chunks
+                continue
+            for j in range(n_chunks):
+                rows.append((doc_index, documents[j], metadatas[j], ids[j], embeddings[offset + j]))
+            offset += n_chunks
+
+        # Flush in fixed-size batches, amortizing SQLite transactions and
+        # HNSW mutations across documents
+        failed_docs = set()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            try:
+                self._write_rows(
+                    documents=[r[1] for r in batch],
+                    metadatas=[r[2] for r in batch],
+                    ids=[r[3] for r in batch],
+                    embeddings=np.vstack([r[4] for r in batch])
+                )
+            except Exception as e:
+                print(f"Error writing batch starting at row {start}: {e}")
+                failed_docs.update(r[0] for r in batch)
+
+        doc_ids = []
+        for doc_index, item in enumerate(prepared):
+            if doc_index in cached_ids:
+                doc_ids.append(cached_ids[doc_index])
+            elif item is not None and doc_index not in failed_docs:
+                doc_id, _, doc_metadata = item
+                self._remember_ingest(doc_metadata, doc_id)
+                doc_ids.append(doc_id)
+            else:
+                doc_ids.append(None)
+        return doc_ids
+
+    async def _get_async_collection(self):
+        """Connect to a server-mode Chroma instance for async writes.
+
+        Requires chroma running as a server (CHROMA_HOST/CHROMA_PORT env);
+        the embedded PersistentClient is synchronous only.
+        """
+        if self._async_collection is None:
+            client = await chromadb.AsyncHttpClient(
+                host=os.getenv("CHROMA_HOST", "localhost"),
+                port=int(os.getenv("CHROMA_PORT", "8000"))
+            )
+            self._async_collection = await client.get_or_create_collection(
+                name="ai_research_paper",
+                metadata={
+                    "description": "AI White paper documents",
+                    "hnsw:space": "ip",
+                    "hnsw:M": 32,
+                    "hnsw:construction_ef": 200,
+                    "hnsw:search_ef": 100
+                }
+            )
+        return self._async_collection
+
+    async def add_document_async(self, processed_document):
+        """Async variant of add_document writing via AsyncHttpClient"""
+        try:
+            doc_id, chunks, doc_metadata = self.prepare_document(processed_document)
+
+            cached_doc_id = self._cached_doc_id(doc_metadata)
+            if cached_doc_id is not None:
+                return cached_doc_id
+
+            # Encode off the event loop so concurrent documents overlap
+            # embedding compute with each other's DB writes
+            embeddings = await asyncio.to_thread(self.generate_embeddings, chunks['content'])
+            embeddings = np.asarray(embeddings).astype(np.float16)
+
+            documents, metadatas, ids = self._build_rows(chunks, doc_metadata, doc_id)
+            collection = await self._get_async_collection()
+            await collection.upsert(
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids,
+                embeddings=embeddings
+            )
+
+            self._remember_ingest(doc_metadata, doc_id)
+            return doc_id
+        except Exception as e:
+            print(f"Error adding document (async): {e}")
+            return None
+
+    async def add_documents_async(self, processed_documents):
+        """Add several documents concurrently via the async Chroma client"""
+        return list(await asyncio.gather(
+            *(self.add_document_async(d) for d in processed_documents)
+        ))
     
-    def search_similar(self, query: str, top_k: int = 5, filters: Optional[Dict] = None, min_similarity: float = 0.1):
-        """Search for similar chunks"""
+    def _embed_query(self, query):
+        """Embed a single query string with an exact-match LRU cache,
+        backed by the persistent embedding cache across restarts"""
+        key = (self.model_name, query)
+        with self._cache_lock:
+            if key in self._query_lru:
+                self._query_lru.move_to_end(key)
+                return self._query_lru[key]
+
+        # The SQLite cache keys by sha256(model + text), so repeat queries
+        # skip the encode even in a fresh process
+        embedding = None
+        if self.cache is not None:
+            cache_key = self._cache_key(query)
+            embedding = self.cache.get_many([cache_key]).get(cache_key)
+
+        if embedding is None:
+            with _inference_ctx():
+                embedding = self.model.encode([query], convert_to_numpy=True, normalize_embeddings=True)[0]
+            if self.cache is not None:
+                self.cache.set_many({self._cache_key(query): embedding})
+
+        with self._cache_lock:
+            self._query_lru[key] = embedding
+            if len(self._query_lru) > self._query_lru_maxsize:
+                self._query_lru.popitem(last=False)
+        return embedding
+
+    def _embed_queries(self, queries):
+        """Embed many queries, encoding all LRU misses in one batch"""
+        embeddings = [None] * len(queries)
+        misses = []
+        with self._cache_lock:
+            for i, query in enumerate(queries):
+                key = (self.model_name, query)
+                if key in self._query_lru:
+                    self._query_lru.move_to_end(key)
+                    embeddings[i] = self._query_lru[key]
+                else:
+                    misses.append(i)
+
+        # Fill LRU misses from the persistent cache before encoding
+        if misses and self.cache is not None:
+            cache_keys = {i: self._cache_key(queries[i]) for i in misses}
+            cached = self.cache.get_many(list(cache_keys.values()))
+            hits = {i: cached[cache_keys[i]] for i in misses if cache_keys[i] in cached}
+            misses = [i for i in misses if i not in hits]
+            with self._cache_lock:
+                for i, hit in hits.items():
+                    embeddings[i] = hit
+                    self._query_lru[(self.model_name, queries[i])] = hit
+
+        if misses:
+            with _inference_ctx():
+                encoded = self.model.encode(
+                    [queries[i] for i in misses],
+                    convert_to_numpy=True, normalize_embeddings=True
+                )
+            if self.cache is not None:
+                self.cache.set_many({self._cache_key(queries[i]): emb
+                                     for i, emb in zip(misses, encoded)})
+            with self._cache_lock:
+                for i, embedding in zip(misses, encoded):
+                    embeddings[i] = embedding
+                    self._query_lru[(self.model_name, queries[i])] = embedding
+
+        with self._cache_lock:
+            while len(self._query_lru) > self._query_lru_maxsize:
+                self._query_lru.popitem(last=False)
+
+        return embeddings
+
+    def _semantic_cache_get(self, query_embedding, top_k, filters, min_similarity):
+        """Return cached results for a near-duplicate query, if fresh enough.
+
+        Entries only match under identical search parameters — a cached
+        result for one doc filter or threshold must not answer a search
+        with another.
+        """
+        now = time.time()
+        with self._cache_lock:
+            self._semantic_cache = [e for e in self._semantic_cache if now - e['time'] < self._semantic_ttl]
+            candidates = [
+                e for e in self._semantic_cache
+                if e['top_k'] == top_k and e['filters'] == filters
+                and e['min_similarity'] == min_similarity
+            ]
+        if not candidates:
+            return None
+
+        # One BLAS call: embeddings are unit-norm, so dot product is cosine
+        cached_matrix = np.vstack([e['embedding'] for e in candidates])
+        scores = cached_matrix @ query_embedding
+        best = int(np.argmax(scores))
+        if scores[best] >= self._semantic_threshold:
+            return candidates[best]['results']
+        return None
+
+    def _semantic_cache_put(self, query_embedding, top_k, filters, min_similarity, results):
+        with self._cache_lock:
+            self._semantic_cache.append({
+                'embedding': query_embedding,
+                'top_k': top_k,
+                'filters': filters,
+                'min_similarity': min_similarity,
+                'results': results,
+                'time': time.time()
+            })
+            if len(self._semantic_cache) > self._semantic_cache_maxsize:
+                self._semantic_cache.pop(0)
+
+    def search_similar(self, query: str, top_k: int = 5, filters: Optional[Dict] = None,
+                       min_similarity: float = 0.1, query_embedding=None):
+        """Search for similar chunks, optionally reusing a precomputed query embedding"""
         try:
-            # Generate query embedding
-            query_embeddings = self.model.encode([query]).tolist() 
-            
-            # Search in vector store
+            # Generate query embedding (cached for repeat queries) unless
+            # the caller already embedded this query
+            if query_embedding is None:
+                query_embedding = self._embed_query(query)
+
+            # Reuse results for paraphrases of recently seen queries
+            cached_results = self._semantic_cache_get(query_embedding, top_k, filters, min_similarity)
+            if cached_results is not None:
+                return cached_results
+
+            # Search in vector store, pushing metadata filters down to Chroma
             results = self.collection.query(
-                query_embeddings=query_embeddings,
-                n_results=top_k
+                query_embeddings=[query_embedding.tolist()],
+                n_results=top_k,
+                where=filters if filters else None
             )
-            
-            # Process and filter results
-            filtered_results = []
-            for doc, metadata, distance in zip(results['documents'][0], results['metadatas'][0], results['distances'][0]):
-                similarity = 1 - distance
-                if similarity >= min_similarity: 
-                    filtered_results.append({
-                        'content': doc,
-                        'metadata': metadata,
-                        'similarity': similarity
-                    })
-            
-            return sorted(filtered_results, key=lambda x: x['similarity'], reverse=True)
+
+            # Chroma returns results ordered by ascending distance, so
+            # similarities are already descending — no re-sort needed, and
+            # the threshold filter is just a prefix cut
+            dists = np.asarray(results['distances'][0], dtype=np.float32)
+            sims = 1.0 - dists
+            cutoff = int(np.searchsorted(-sims, -min_similarity, side='right'))
+
+            final_results = [
+                {
+                    'content': results['documents'][0][i],
+                    'metadata': results['metadatas'][0][i],
+                    'similarity': float(sims[i])
+                }
+                for i in range(cutoff)
+            ]
+            self._semantic_cache_put(query_embedding, top_k, filters, min_similarity, final_results)
+            return final_results
         except Exception as e:
             print(f"Error searching: {e}")
             return []
+
+    def search_similar_batch(self, queries, top_k: int = 5, filters: Optional[Dict] = None,
+                             min_similarity: float = 0.1, query_embeddings=None):
+        """Search for many queries with one encode and one vector-store call"""
+        try:
+            if query_embeddings is None:
+                query_embeddings = self._embed_queries(queries)
+
+            results = self.collection.query(
+                query_embeddings=[e.tolist() for e in query_embeddings],
+                n_results=top_k,
+                where=filters if filters else None
+            )
+
+            all_results = []
+            for q in range(len(queries)):
+                dists = np.asarray(results['distances'][q], dtype=np.float32)
+                sims = 1.0 - dists
+                cutoff = int(np.searchsorted(-sims, -min_similarity, side='right'))
+                all_results.append([
+                    {
+                        'content': results['documents'][q][i],
+                        'metadata': results['metadatas'][q][i],
+                        'similarity': float(sims[i])
+                    }
+                    for i in range(cutoff)
+                ])
+            return all_results
+        except Exception as e:
+            print(f"Error searching: {e}")
+            return [[] for _ in queries]
             
-    def get_chunk_by_id(self, chunk_id):
-        """Retrieve specific chunk by ID"""
+    def get_chunk_by_id(self, chunk_id, include_embeddings: bool = False):
+        """Retrieve specific chunk by ID; vectors only when explicitly asked"""
         try:
-            result = self.collection.get(ids=[chunk_id],
-                                      include=['documents', 'metadatas', 'embeddings'])
+            include = ['documents', 'metadatas'] + (['embeddings'] if include_embeddings else [])
+            result = self.collection.get(ids=[chunk_id], include=include)
             return result
         except Exception as e:
             print(f"Error retrieving chunk {chunk_id}: {e}")
@@ -136,15 +832,40 @@ class EmbeddingManager:
             return False
     
     def list_documents(self, limit=100) -> List[Dict]:
-        """List all stored documents with basic info"""
+        """List ingested documents with basic info, newest first.
+
+        Reads the SQLite documents table maintained at ingest time, so the
+        cost is O(limit) regardless of how many chunks are stored.
+        """
         try:
-            collection_info = self.client.list_collections()
-            return collection_info
+            if self.cache is None:
+                return []
+            return self.cache.list_documents(limit)
         except Exception as e:
             print(f"Error listing documents: {e}")
             return []
 
 # Utility functions
+try:
+    import xxhash
+
+    def _hash_id(key: str) -> str:
+        return xxhash.xxh3_64_hexdigest(key)
+except ImportError:
+    def _hash_id(key: str) -> str:
+        return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+def _chunk_id(filename, chunk_index, content):
+    """Deterministic content-addressed chunk ID.
+
+    Stable across re-ingestions of the same file (unlike the timestamped
+    doc_id), so identical chunks map to the same row instead of piling up
+    duplicates in the shared collection.
+    """
+    return f"chunk_{_hash_id(f'{filename}:{chunk_index}:{content[:64]}')}"
+
+
 def _generate_doc_id(filename):
     """Generate unique document ID"""
     from pathlib import Path
@@ -1,54 +1,162 @@
 # PDF parsing, chunking
-import PyPDF2
+import hashlib
+import multiprocessing
+import os
+import numpy as np
+import pypdf
 import re
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any
 from datetime import datetime
 from pathlib import Path
 from docx import Document as DocxDocument
 
+# Compiled once; smart_chunking runs per page
+_SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def _file_fingerprint(file_path):
+    """Content hash of a file's bytes, read in 1 MiB chunks"""
+    digest = hashlib.blake2b(usedforsecurity=False)
+    with open(file_path, 'rb') as file:
+        while True:
+            block = file.read(1024 * 1024)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
 
 def process_file(file_path):
     """Process file based on its type and extract content with metadata"""
     path = Path(file_path)
-    
+
     if not path.exists():
         raise FileNotFoundError(f"File not found: {file_path}")
-    
+
     # Detect file type and extract content
     if path.suffix.lower() == ".pdf":
-        return _extract_pdf(file_path)
+        processed = _extract_pdf(file_path)
     elif path.suffix.lower() == ".docx":
-        return _extract_docx(file_path)
+        processed = _extract_docx(file_path)
     elif path.suffix.lower() in ['.txt', '.md']:
-        return _extract_text(file_path)
+        processed = _extract_text(file_path)
     else:
         raise ValueError(f"Unsupported file format: {path.suffix}")
 
+    # Fingerprint the raw bytes so downstream ingest can skip files it
+    # has already embedded
+    processed['metadata']['fingerprint'] = _file_fingerprint(file_path)
+    return processed
+
+
+def ingest_file(args):
+    """Parse and chunk one saved upload, returning a result tuple.
+
+    Lives here (not in the Streamlit script) so ProcessPoolExecutor
+    workers can import it under the spawn start method, where the app
+    script's synthetic __main__ is not importable.
+    """
+    filename, tmp_path = args
+    try:
+        return filename, tmp_path, process_file(tmp_path), None
+    except Exception as e:
+        return filename, tmp_path, None, str(e)
+
 
 def _extract_pdf(file_path):
     """Extracting details from the pdf file format including the metadata"""
-    pages_data = extract_text_with_pages(file_path)
-    meta_data = extract_pdf_metadata(file_path)
-    
+    # Open and parse the PDF once, sharing the reader between text and
+    # metadata extraction instead of re-parsing the file twice
+    try:
+        with open(file_path, 'rb') as file:
+            pdf_reader = pypdf.PdfReader(file)
+            page_count = len(pdf_reader.pages)
+            if _use_parallel_pages(page_count):
+                pages_data = _collect_pages_parallel(file_path, page_count)
+            else:
+                pages_data = _collect_pages(pdf_reader)
+            meta_data = _collect_pdf_metadata(pdf_reader, Path(file_path))
+    except Exception as e:
+        raise Exception(f"Error processing PDF {file_path}: {str(e)}")
+
     # Chunk with page metadata preserved
     chunks = chunk_pages_with_metadata(pages_data, meta_data)
-    
+
     return {'content': chunks, 'metadata': meta_data}
 
 
+# Per-page layout analysis is pure CPU and pages are independent, so long
+# PDFs are extracted by a pool of worker processes, each holding its own
+# parsed reader
+_PARALLEL_PAGE_THRESHOLD = 8
+_worker_reader = None
+
+
+def _use_parallel_pages(page_count):
+    """Parallelize only long PDFs, and never from inside a worker process"""
+    return (
+        page_count >= _PARALLEL_PAGE_THRESHOLD
+        and (os.cpu_count() or 1) > 1
+        and multiprocessing.current_process().name == "MainProcess"
+    )
+
+
+def _page_worker_init(file_path):
+    """Parse the PDF once per worker so page extraction amortizes the xref load"""
+    global _worker_reader
+    _worker_reader = pypdf.PdfReader(file_path)
+
+
+def _extract_page_text(page_index):
+    return page_index, _worker_reader.pages[page_index].extract_text()
+
+
+def _collect_pages_parallel(file_path, page_count):
+    """Extract all pages in parallel worker processes, in page order"""
+    with ProcessPoolExecutor(
+        max_workers=min(os.cpu_count() or 1, page_count),
+        initializer=_page_worker_init,
+        initargs=(file_path,)
+    ) as executor:
+        results = sorted(executor.map(_extract_page_text, range(page_count)))
+
+    return [{'page_number': idx + 1, 'text': text} for idx, text in results]
+
+
+def _collect_pages(pdf_reader):
+    """Extract text from an open reader, preserving page boundaries"""
+    return [
+        {'page_number': page_num + 1, 'text': page.extract_text()}
+        for page_num, page in enumerate(pdf_reader.pages)
+    ]
+
+
+def _collect_pdf_metadata(pdf_reader, path):
+    """Extract document-level metadata from an open reader"""
+    file_stats = path.stat()
+
+    # Safely extract PDF metadata with fallbacks
+    pdf_metadata = pdf_reader.metadata or {}
+
+    return {
+        'filename': path.name,
+        'file_size': file_stats.st_size,
+        'file_type': path.suffix.lower(),
+        'page_count': len(pdf_reader.pages),
+        'file_title': pdf_metadata.get('/Title', '') or '',
+        'author': pdf_metadata.get('/Author', '') or '',
+        'subject': pdf_metadata.get('/Subject', '') or '',
+        'creator': pdf_metadata.get('/Creator', '') or '',
+        'creation_date': str(pdf_metadata.get('/CreationDate', '') or '')
+    }
+
+
 def extract_text_with_pages(file_path: str):
     """Extract text preserving page boundaries"""
-    path = Path(file_path)
-    content = []
-    
     try:
         with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page_num, page in enumerate(pdf_reader.pages):
-                page_text = page.extract_text()
-                content.append({'page_number': page_num+1,
-                                'text': page_text})
-        return content
+            return _collect_pages(pypdf.PdfReader(file))
     except Exception as e:
         raise Exception(f"Error processing PDF {file_path}: {str(e)}")
 
@@ -56,87 +164,145 @@ def extract_text_with_pages(file_path: str):
 def extract_pdf_metadata(file_path):
     """Extract document-level metadata"""
     path = Path(file_path)
-    
+
     try:
-        file_stats = path.stat()
-        pdf_reader = PyPDF2.PdfReader(file_path)
-        
-        # Safely extract PDF metadata with fallbacks
-        pdf_metadata = pdf_reader.metadata or {}
-        
-        return {
-            'filename': path.name,
-            'file_size': file_stats.st_size,
-            'file_type': path.suffix.lower(),
-            'page_count': len(pdf_reader.pages),
-            'file_title': pdf_metadata.get('title', '') or '',
-            'author': pdf_metadata.get('author', '') or '',
-            'subject': pdf_metadata.get('subject', '') or '',
-            'creator': pdf_metadata.get('creator', '') or '',
-            'creation_date': pdf_metadata.get('creation_date', '') or ''
-        }
+        with open(file_path, 'rb') as file:
+            return _collect_pdf_metadata(pypdf.PdfReader(file), path)
     except Exception as e:
         raise Exception(f"Error extracting metadata from {file_path}: {str(e)}")
 
 
-def smart_chunking(text, target_size=150, overlap_size=30):
-    """Chunking with pre-defined chunk size and overlap between the two chunks"""
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    
-    chunks = []
-    current_chunk = ""
-    
-    for sentence in sentences:
-        if current_chunk:
-            potential_chunk = current_chunk + " " + sentence
-        else:
-            potential_chunk = sentence
-        
-        if len(potential_chunk) <= target_size:  
-            current_chunk = potential_chunk
-        else: 
-            if current_chunk: 
-                chunks.append({
-                    'content': current_chunk.strip(),
-                    'length': len(current_chunk),
-                })
-            
-            # Creating overlap for the next chunk
-            if len(current_chunk) >= overlap_size:
-                overlap = current_chunk[-overlap_size:]
-            else:
-                overlap = current_chunk
-            
-            # Start new chunk with overlap and current sentence
-            if overlap:
-                current_chunk = overlap + " " + sentence
-            else:
-                current_chunk = sentence
-            
-    # Adding final chunk
-    if current_chunk.strip():
-        chunks.append({
-            'content': current_chunk.strip(),
-            'length': len(current_chunk),
-        })
-    
+def _compute_chunk_spans(cum, target_size, overlap_size):
+    """Compute chunk boundaries from cumulative sentence lengths.
+
+    `cum[i]` is the character count of the first i sentences joined with
+    single spaces, plus one trailing space. Returns parallel arrays of
+    chunk start/end sentence indices and the overlap length carried into
+    each chunk — pure integer arithmetic, no string work.
+    """
+    n = len(cum) - 1
+    starts = np.empty(n, dtype=np.int64)
+    ends = np.empty(n, dtype=np.int64)
+    overlaps = np.empty(n, dtype=np.int64)
+
+    count = 0
+    start = 0
+    overlap_len = 0
+    while start < n:
+        budget = target_size - (overlap_len + 1 if overlap_len else 0)
+        if budget < 1:
+            budget = 1
+
+        # Furthest sentence end whose joined length still fits the budget
+        end = np.searchsorted(cum, cum[start] + budget + 1, side='right') - 1
+        if end <= start:
+            end = start + 1  # oversized sentence becomes its own chunk
+
+        starts[count] = start
+        ends[count] = end
+        overlaps[count] = overlap_len
+        count += 1
+
+        chunk_len = (overlap_len + 1 if overlap_len else 0) + (cum[end] - cum[start] - 1)
+        overlap_len = overlap_size if chunk_len >= overlap_size else chunk_len
+        start = end
+
+    return starts[:count], ends[:count], overlaps[:count]
+
+
+# The span scan is tight integer arithmetic with branching — exactly what
+# numba compiles well. String work stays in Python either way.
+try:
+    import numba
+    _compute_chunk_spans = numba.njit(cache=True)(_compute_chunk_spans)
+except ImportError:
+    pass
+
+
+def _token_chunking(text, tokenizer, target_tokens, overlap_tokens):
+    """Chunk by sliding a token window, so chunk size matches the encoder's
+    actual budget instead of an approximate character count"""
+    enc = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+    offsets = enc['offset_mapping']
+    chunks = {'content': [], 'length': [], 'char_start': [], 'char_end': []}
+    if not offsets:
+        return chunks
+
+    step = max(target_tokens - overlap_tokens, 1)
+    for start in range(0, len(offsets), step):
+        window = offsets[start:start + target_tokens]
+        # Slice the original text via token offsets, keeping the char span
+        # for citations
+        char_start, char_end = window[0][0], window[-1][1]
+        content = text[char_start:char_end].strip()
+        if content:
+            chunks['content'].append(content)
+            chunks['length'].append(len(content))
+            chunks['char_start'].append(char_start)
+            chunks['char_end'].append(char_end)
+        if start + target_tokens >= len(offsets):
+            break
     return chunks
 
 
-def chunk_pages_with_metadata(pages_data, doc_metadata, target_size=150, overlap_size=30):
-    """Chunk pages while preserving page numbers"""
-    all_chunks = []
-    
+def smart_chunking(text, target_size=150, overlap_size=30,
+                   tokenizer=None, target_tokens=128, overlap_tokens=16):
+    """Chunking with pre-defined chunk size and overlap between the two chunks.
+
+    When a HuggingFace tokenizer is supplied, chunks are cut on token
+    boundaries (target_tokens wide with overlap_tokens of overlap) so they
+    line up with the embedding model's window instead of a character count.
+    """
+    if tokenizer is not None:
+        return _token_chunking(text, tokenizer, target_tokens, overlap_tokens)
+
+    sentences = _SENT_SPLIT_RE.split(text.strip())
+
+    # Cumulative joined lengths let the boundary scan run on integers;
+    # each chunk string is then built with a single join
+    lengths = np.fromiter((len(s) + 1 for s in sentences), dtype=np.int64, count=len(sentences))
+    cum = np.concatenate(([0], np.cumsum(lengths)))
+
+    starts, ends, overlaps = _compute_chunk_spans(cum, target_size, overlap_size)
+
+    contents = []
+    previous = ""
+    for start, end, overlap_len in zip(starts, ends, overlaps):
+        body = " ".join(sentences[start:end])
+        content = (previous[-overlap_len:] + " " + body).strip() if overlap_len else body.strip()
+        if content:
+            contents.append(content)
+            previous = content
+
+    return {
+        'content': contents,
+        'length': [len(c) for c in contents],
+    }
+
+
+def chunk_pages_with_metadata(pages_data, doc_metadata, target_size=150, overlap_size=30, tokenizer=None):
+    """Chunk pages while preserving page numbers.
+
+    Chunks are columnar (a dict of aligned lists) so per-page metadata is
+    attached with list extends rather than one dict write per chunk.
+    """
+    all_chunks = {'content': [], 'length': [], 'page_number': [], 'doc_id': []}
+
     for page in pages_data:
         # Using smart chunking
-        page_chunks = smart_chunking(page['text'], target_size, overlap_size)
-        
-        # Add page number and document info to each chunk
-        for chunk in page_chunks:
-            chunk['page_number'] = page['page_number']
-            chunk['doc_id'] = doc_metadata['filename']
-            all_chunks.append(chunk)
-    
+        page_chunks = smart_chunking(page['text'], target_size, overlap_size, tokenizer=tokenizer)
+        n = len(page_chunks['content'])
+
+        all_chunks['content'].extend(page_chunks['content'])
+        all_chunks['length'].extend(page_chunks['length'])
+        all_chunks['page_number'].extend([page['page_number']] * n)
+        all_chunks['doc_id'].extend([doc_metadata['filename']] * n)
+
+        # Token-mode chunks also carry char spans for citations
+        for key in ('char_start', 'char_end'):
+            if key in page_chunks:
+                all_chunks.setdefault(key, []).extend(page_chunks[key])
+
     return all_chunks
 
 
@@ -1,14 +1,104 @@
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
 from typing import Dict, List, Optional
-from transformers import pipeline
-from backend.retrieval import retrieve_relevant_chunks
-from openai import OpenAI
+from backend.retrieval import retrieve_relevant_chunks, retrieve_relevant_chunks_batch
+import httpx
+import logging
+from openai import AsyncOpenAI, OpenAI
 from backend.config import OPENAI_API_KEY
 
+logger = logging.getLogger(__name__)
+
+# Compiled once; matched against every LLM response. The captured group is
+# the source number, so citations dedupe as ints.
+_CITATION_RE = re.compile(r'\(Source (\d+)\)')
+
+# Mode-specific instructions built once; _build_citation_prompt indexes in
+_MODE_INSTRUCTIONS = {
+    "normal": (
+        "Answer in exactly 2 lines: Line 1 should summarize the main finding/contribution. "
+        "Line 2 should list sources using format: Sources: (Source 1), (Source 2). "
+        "Base your answer ONLY on the provided context. If the context doesn't contain enough information to answer the question, "
+        "write 'Insufficient information in provided sources to answer this question.' Use the exact citation format shown."
+    ),
+    "compare": (
+        "Compare in exactly 2 lines: Line 1 should state the key similarity or difference. "
+        "Line 2 should cite which sources support each claim using format: Sources: (Source 1), (Source 2). "
+        "Base comparison ONLY on the provided context. If the context doesn't contain enough information for comparison, "
+        "write 'Insufficient information in provided sources for comparison.'"
+    ),
+    "simplify": (
+        "Explain in exactly 2 lines using simple language: Line 1 should give a plain English explanation. "
+        "Line 2 should list sources using format: Sources: (Source 1), (Source 2). "
+        "Avoid technical jargon. Base explanation ONLY on the provided context. If the context doesn't contain enough information, "
+        "write 'Insufficient information in provided sources to explain this topic.'"
+    ),
+}
+
+class LLMError(Exception):
+    """Raised when the LLM call fails after any retries"""
+
+
+def _error_answer(query: str, error: Exception) -> Dict:
+    """Standard error-shaped answer dict returned when generation fails"""
+    return {
+        'answer': f"Error generating answer: {error}",
+        'has_citations': False,
+        'citations_used': [],
+        'citation_map': {},
+        'query': query,
+        'sources_count': 0,
+        'confidence': 'error'
+    }
+
+
+# Every mode asks for exactly 2 lines, so decode far fewer tokens than the
+# 512 default; the blank-line stop halts the model right after the answer
+_MODE_MAX_TOKENS = {"normal": 96, "compare": 96, "simplify": 96}
+_STOP_SEQUENCES = ["\n\n"]
+
+# System message per mode, built once. Everything invariant across calls
+# (persona, mode instruction, citation format rule) lives here so the token
+# prefix is identical call to call and the provider's automatic prompt
+# caching skips re-prefilling it. Per-query text goes in the user message.
+# (When serving through vLLM, run with --enable-prefix-caching for the
+# same effect.)
+_SYSTEM_PROMPTS = {
+    mode: (
+        "You are a helpful research assistant.\n"
+        "\n"
+        f"{instruction}\n"
+        "\n"
+        "Cite using format: (Source 1), (Source 2), etc."
+    )
+    for mode, instruction in _MODE_INSTRUCTIONS.items()
+}
+
+# User-message skeleton built once; filled per query
+_PROMPT_TEMPLATE = (
+    "{citation_instructions}\n"
+    "\n"
+    "CONTEXT: {formatted_context}\n"
+    "QUESTION: {query}\n"
+    "\n"
+    "ANSWER:"
+)
+
 class RAGPipeline:
-    def __init__(self, model_name="gpt-4o-mini", max_length=512, api_key=None):
+    def __init__(self, model_name="gpt-4o-mini", max_length=512, api_key=None,
+                 draft_model_name="gpt-4.1-nano"):
         """Initialize RAG pipeline with OpenAI API"""
         self.model_name = model_name
         self.max_length = max_length
+        # Cheaper model used for parallel drafts in _speculative_generate
+        self.draft_model_name = draft_model_name
         
         # Use passed api_key or fall back to config
         if api_key is None:
@@ -17,104 +107,381 @@ class RAGPipeline:
         if not api_key:
             raise ValueError("API key must be provided for LLM access")
     
-        self.client = OpenAI(api_key=api_key)
+        # Size the connection pool for concurrent use so parallel requests
+        # reuse keep-alive connections instead of paying TLS setup each time
+        limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        self.client = OpenAI(api_key=api_key, http_client=httpx.Client(limits=limits))
+        self.aclient = AsyncOpenAI(api_key=api_key, http_client=httpx.AsyncClient(limits=limits))
+        self.max_concurrent_requests = 8
+
+        # Semantic cache: paraphrases of a recently answered query reuse
+        # its answer instead of a new LLM round-trip. The pipeline is a
+        # shared singleton, so mutations are lock-protected.
+        self._semantic_cache_lock = threading.Lock()
+        self._semantic_cache = []
+        self._semantic_cache_maxsize = 128
+        self._semantic_threshold = 0.95
+        self._semantic_ttl = 300  # seconds
+
+    def _semantic_cache_get(self, query_embedding, mode, top_k, max_context_tokens):
+        now = time.time()
+        with self._semantic_cache_lock:
+            self._semantic_cache = [e for e in self._semantic_cache if now - e['time'] < self._semantic_ttl]
+            # Only answers produced under the same retrieval parameters match;
+            # a top_k=5 answer must not stand in for a top_k=10 request
+            candidates = [
+                e for e in self._semantic_cache
+                if e['mode'] == mode and e['top_k'] == top_k
+                and e['max_context_tokens'] == max_context_tokens
+            ]
+        if not candidates or query_embedding is None:
+            return None
+
+        # Unit-norm vectors: one matrix-vector product gives cosines
+        cached_matrix = np.vstack([e['embedding'] for e in candidates])
+        scores = cached_matrix @ query_embedding
+        best = int(np.argmax(scores))
+        if scores[best] >= self._semantic_threshold:
+            return dict(candidates[best]['result'])
+        return None
 
-    def generate_answer_with_citations(self, query: str, top_k: int = 5, mode: str = "normal"):
+    def _semantic_cache_put(self, query_embedding, mode, top_k, max_context_tokens, result):
+        if query_embedding is None:
+            return
+        with self._semantic_cache_lock:
+            self._semantic_cache.append({
+                'embedding': query_embedding,
+                'mode': mode,
+                'top_k': top_k,
+                'max_context_tokens': max_context_tokens,
+                'result': dict(result),
+                'time': time.time()
+            })
+            if len(self._semantic_cache) > self._semantic_cache_maxsize:
+                self._semantic_cache.pop(0)
+
+    def generate_answer_with_citations(self, query: str, top_k: int = 5, mode: str = "normal",
+                                       max_context_tokens: int = 2000):
         """Main function to generate answers with citations"""
-        context_data = retrieve_relevant_chunks(query, top_k)
-        
+        context_data = retrieve_relevant_chunks(query, top_k, max_context_tokens=max_context_tokens)
+        query_embedding = context_data.get('query_embedding')
+
+        # Paraphrase of a recent query? Reuse its answer, skipping the LLM
+        cached = self._semantic_cache_get(query_embedding, mode, top_k, max_context_tokens)
+        if cached is not None:
+            return cached
+
         # Build prompt based on mode
-        prompt = self._build_citation_prompt(context_data, mode)
-        
+        messages = self._build_citation_prompt(context_data, mode)
+
         # Call LLM
-        raw_response = self._call_llm(prompt)
-        
+        try:
+            raw_response = self._call_llm(messages, mode=mode)
+        except LLMError as e:
+            return _error_answer(query, e)
+
         # Process and format response
         final_answer = self._process_llm_response(raw_response, context_data)
-        
+
+        self._semantic_cache_put(query_embedding, mode, top_k, max_context_tokens, final_answer)
         return final_answer
-        
-    def _build_citation_prompt(self, context_data: Dict, mode: str) -> str:
-        """Build prompt based on mode with citation instructions"""
+
+    def _build_citation_prompt(self, context_data: Dict, mode: str) -> List[Dict]:
+        """Build chat messages for a query: a static system message per mode
+        plus a user message carrying the sources, context and question"""
         # Extract common components from the context data
         formatted_context = context_data['formatted_context']
-        citation_map = context_data['citation_map'] 
+        citation_map = context_data['citation_map']
         query = context_data['query']
-        
-        # Build citation instructions
-        citation_instructions = "AVAILABLE SOURCES:\n"
-        for source, reference in citation_map.items():
-            citation_instructions += f"- {source}: {reference}\n"
-        citation_instructions += "\nCite using format: (Source 1), (Source 2), etc."
-        
-        # Mode-specific prompt variations
-        # Mode-specific prompt variations
-        if mode == "normal":
-            mode_instruction = (
-                "Answer in exactly 2 lines: Line 1 should summarize the main finding/contribution. "
-                "Line 2 should list sources using format: Sources: (Source 1), (Source 2). "
-                "Base your answer ONLY on the provided context. If the context doesn't contain enough information to answer the question, "
-                "write 'Insufficient information in provided sources to answer this question.' Use the exact citation format shown."
-            )
-        elif mode == "compare":
-            mode_instruction = (
-                "Compare in exactly 2 lines: Line 1 should state the key similarity or difference. "
-                "Line 2 should cite which sources support each claim using format: Sources: (Source 1), (Source 2). "
-                "Base comparison ONLY on the provided context. If the context doesn't contain enough information for comparison, "
-                "write 'Insufficient information in provided sources for comparison.'"
-            )
-        elif mode == "simplify":
-            mode_instruction = (
-                "Explain in exactly 2 lines using simple language: Line 1 should give a plain English explanation. "
-                "Line 2 should list sources using format: Sources: (Source 1), (Source 2). "
-                "Avoid technical jargon. Base explanation ONLY on the provided context. If the context doesn't contain enough information, "
-                "write 'Insufficient information in provided sources to explain this topic.'"
-            )
-                    
-        return f"""
-        {citation_instructions}
-        
-        CONTEXT: {formatted_context}
-        QUESTION: {query}
-        INSTRUCTION: {mode_instruction}
-        
-        ANSWER:
-        """
-    def _call_llm(self, prompt: str) -> str:
+
+        try:
+            system_prompt = _SYSTEM_PROMPTS[mode]
+        except KeyError:
+            raise ValueError(f"Unknown mode: {mode}. Valid modes: {', '.join(_SYSTEM_PROMPTS)}")
+
+        # Build citation instructions with a single join, not += per source
+        lines = ["AVAILABLE SOURCES:"]
+        lines.extend(f"- {source}: {reference}" for source, reference in citation_map.items())
+        citation_instructions = "\n".join(lines)
+
+        user_prompt = _PROMPT_TEMPLATE.format(
+            citation_instructions=citation_instructions,
+            formatted_context=formatted_context,
+            query=query
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _max_tokens_for(self, mode: Optional[str]) -> int:
+        return _MODE_MAX_TOKENS.get(mode, self.max_length)
+
+    def _call_llm(self, messages: List[Dict], mode: Optional[str] = None) -> str:
         """Make API call using OpenAI API"""
-        print("=== DEBUG: Starting LLM call ===")
-        print(f"Prompt length: {len(prompt)}")
-        print(f"First 200 chars of prompt: {prompt[:200]}")
+        # Guarded so no formatting or stdout work happens unless debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prompt length: %d", sum(len(m['content']) for m in messages))
+            logger.debug("Prompt head: %s", messages[-1]['content'][:200])
 
         try:
-            print("Calling OpenAI API...")
             response = self.client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are a helpful research assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=self.max_length
+                messages=messages,
+                max_tokens=self._max_tokens_for(mode),
+                stop=_STOP_SEQUENCES
             )
 
             answer = response.choices[0].message.content.strip()
-            print(f"Generated answer: '{answer[:200]}'...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Generated answer: %s...", answer[:200])
             return answer
 
         except Exception as e:
-            print(f"Error calling LLM: {e}")
-            import traceback
-            traceback.print_exc()
-            return "Error generating response"
+            # Raise a typed error instead of returning a magic string the
+            # response processor would mistake for a real answer
+            logger.exception("LLM call failed")
+            raise LLMError(str(e)) from e
+
+    def _call_llm_stream(self, messages: List[Dict], mode: Optional[str] = None):
+        """Yield completion tokens as the API produces them"""
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                max_tokens=self._max_tokens_for(mode),
+                stop=_STOP_SEQUENCES,
+                stream=True
+            )
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except Exception as e:
+            logger.exception("LLM call failed")
+            raise LLMError(str(e)) from e
+
+    def generate_answer_with_citations_stream(self, query: str, top_k: int = 5, mode: str = "normal",
+                                              max_context_tokens: int = 2000):
+        """Streaming variant: yields the accumulating answer text as tokens
+        arrive, then the processed answer dict as the final item"""
+        context_data = retrieve_relevant_chunks(query, top_k, max_context_tokens=max_context_tokens)
+        messages = self._build_citation_prompt(context_data, mode)
+
+        parts = []
+        try:
+            for token in self._call_llm_stream(messages, mode=mode):
+                parts.append(token)
+                yield "".join(parts)
+        except LLMError as e:
+            # Surface the failure as the standard error dict and keep it
+            # out of the semantic cache, matching the sync path
+            yield _error_answer(query, e)
+            return
+
+        final_answer = self._process_llm_response("".join(parts).strip(), context_data)
+        self._semantic_cache_put(context_data.get('query_embedding'), mode, top_k,
+                                 max_context_tokens, final_answer)
+        yield final_answer
+
+    async def _acall_llm(self, messages: List[Dict], mode: Optional[str] = None,
+                         max_retries: int = 3, model: Optional[str] = None) -> str:
+        """Async API call, retrying rate-limit errors with exponential backoff"""
+        for attempt in range(max_retries + 1):
+            try:
+                response = await self.aclient.chat.completions.create(
+                    model=model or self.model_name,
+                    messages=messages,
+                    max_tokens=self._max_tokens_for(mode),
+                    stop=_STOP_SEQUENCES
+                )
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                # Retry 429s; other errors fall through to the error string
+                is_rate_limit = getattr(e, 'status_code', None) == 429 or '429' in str(e)
+                if is_rate_limit and attempt < max_retries:
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                logger.exception("LLM call failed")
+                raise LLMError(str(e)) from e
+
+    async def agenerate_answer_with_citations(self, query: str, top_k: int = 5, mode: str = "normal",
+                                              context_data: Optional[Dict] = None,
+                                              max_context_tokens: int = 2000):
+        """Async variant of generate_answer_with_citations.
+
+        Retrieval is CPU-bound and fast, so only the LLM call awaits; the
+        semantic cache is shared with the sync path. Batch callers pass a
+        pre-retrieved context_data to skip per-query retrieval.
+        """
+        if context_data is None:
+            context_data = retrieve_relevant_chunks(query, top_k, max_context_tokens=max_context_tokens)
+        query_embedding = context_data.get('query_embedding')
+
+        cached = self._semantic_cache_get(query_embedding, mode, top_k, max_context_tokens)
+        if cached is not None:
+            return cached
+
+        messages = self._build_citation_prompt(context_data, mode)
+        try:
+            raw_response = await self._acall_llm(messages, mode=mode)
+        except LLMError as e:
+            # One failed query shouldn't take a whole gather down with it
+            return _error_answer(query, e)
+        final_answer = self._process_llm_response(raw_response, context_data)
+
+        self._semantic_cache_put(query_embedding, mode, top_k, max_context_tokens, final_answer)
+        return final_answer
+
+    async def answer_questions_batch(self, queries: List[str], mode: str = "normal", top_k: int = 5):
+        """Answer many queries concurrently, bounded by a semaphore so a
+        large batch doesn't blow through the API rate limit"""
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        # One encode and one vector-store call for the whole batch
+        contexts = retrieve_relevant_chunks_batch(queries, top_k)
+
+        async def answer_one(query, context_data):
+            async with semaphore:
+                return await self.agenerate_answer_with_citations(
+                    query, top_k=top_k, mode=mode, context_data=context_data
+                )
+
+        return await asyncio.gather(*(answer_one(q, c) for q, c in zip(queries, contexts)))
+
+    async def _speculative_generate(self, query: str, top_k: int = 5, mode: str = "normal",
+                                    num_drafts: int = 2, max_context_tokens: int = 2000):
+        """Draft-then-verify generation (Speculative RAG).
+
+        The retrieved chunks are split into disjoint groups and a cheaper
+        model drafts an answer per group in parallel; the main model then
+        sees all drafts with the full context and writes the final answer.
+        The big model decodes once over a prompt it can mostly verify
+        rather than compose, cutting its share of the work.
+        """
+        from backend.retrieval import _format_results
+
+        context_data = retrieve_relevant_chunks(query, top_k, max_context_tokens=max_context_tokens)
+        chunks = context_data['context_chunks']
+        if len(chunks) < num_drafts * 2:
+            # Too little context to split usefully; answer directly
+            return await self.agenerate_answer_with_citations(
+                query, top_k=top_k, mode=mode, context_data=context_data
+            )
+
+        # Round-robin split so each group spans the relevance ranking
+        groups = [chunks[i::num_drafts] for i in range(num_drafts)]
+        draft_calls = []
+        for group in groups:
+            formatted_context, citation_map = _format_results(group)
+            group_data = {
+                'query': query,
+                'context_chunks': group,
+                'formatted_context': formatted_context,
+                'citation_map': citation_map
+            }
+            draft_calls.append(self._acall_llm(
+                self._build_citation_prompt(group_data, mode),
+                mode=mode, model=self.draft_model_name
+            ))
+        try:
+            drafts = await asyncio.gather(*draft_calls)
+        except LLMError as e:
+            return _error_answer(query, e)
+
+        # Verifier pass: the full context plus the drafts to check against
+        messages = self._build_citation_prompt(context_data, mode)
+        draft_lines = "\n".join(f"Draft {i + 1}: {d}" for i, d in enumerate(drafts))
+        messages[-1]['content'] += (
+            "\n\nCANDIDATE DRAFTS (written from partial context; verify against "
+            "the full context above and produce the best final answer):\n"
+            f"{draft_lines}"
+        )
+        try:
+            raw_response = await self._acall_llm(messages, mode=mode)
+        except LLMError as e:
+            return _error_answer(query, e)
+
+        final_answer = self._process_llm_response(raw_response, context_data)
+        self._semantic_cache_put(context_data.get('query_embedding'), mode, top_k,
+                                 max_context_tokens, final_answer)
+        return final_answer
+
+    def generate_answers_batch_api(self, queries: List[str], mode: str = "normal",
+                                   top_k: int = 5, poll_interval: int = 30,
+                                   timeout: int = 24 * 3600):
+        """Answer a bulk query set through OpenAI's Batch API.
+
+        Trades latency for cost and throughput: requests are written to a
+        JSONL file, submitted as one batch with a 24h completion window,
+        and polled until done. Suited to offline evaluation or cache
+        pre-warming, not interactive queries. Returns a dict mapping each
+        query to its processed answer (or an error string).
+        """
+        # Retrieval happens up front so the batch file carries final prompts
+        contexts = {}
+        for i, query in enumerate(queries):
+            contexts[f"q{i}"] = retrieve_relevant_chunks(query, top_k)
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.jsonl', delete=False) as batch_file:
+            for custom_id, context_data in contexts.items():
+                messages = self._build_citation_prompt(context_data, mode)
+                batch_file.write(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.model_name,
+                        "messages": messages,
+                        "max_tokens": self._max_tokens_for(mode),
+                        "stop": _STOP_SEQUENCES
+                    }
+                }) + "\n")
+            batch_path = batch_file.name
+
+        try:
+            with open(batch_path, 'rb') as file:
+                uploaded = self.client.files.create(file=file, purpose="batch")
+            batch = self.client.batches.create(
+                input_file_id=uploaded.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+
+            deadline = time.time() + timeout
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                if time.time() > deadline:
+                    raise TimeoutError(f"Batch {batch.id} still {batch.status} after {timeout}s")
+                time.sleep(poll_interval)
+                batch = self.client.batches.retrieve(batch.id)
+
+            if batch.status != "completed":
+                raise RuntimeError(f"Batch {batch.id} ended with status {batch.status}")
+
+            output = self.client.files.content(batch.output_file_id).text
+        except Exception as e:
+            logger.exception("Error running batch: %s", e)
+            return {}
+        finally:
+            os.unlink(batch_path)
+
+        # Route each response line back through the normal post-processing
+        results = {}
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            context_data = contexts.get(row['custom_id'])
+            if context_data is None:
+                continue
+            raw = row['response']['body']['choices'][0]['message']['content'].strip()
+            results[context_data['query']] = self._process_llm_response(raw, context_data)
+        return results
 
-    
     def _process_llm_response(self, raw_response: str, context_data: Dict) -> Dict:
         """Process and validate LLM response"""
-        import re
-        
-        # Check if citations are present
-        citation_pattern = r'\(Source \d+\)'
-        citations_found = re.findall(citation_pattern, raw_response)
+        # Unique source numbers cited, in source order
+        citations_found = sorted(set(map(int, _CITATION_RE.findall(raw_response))))
         has_citations = len(citations_found) > 0
         
         # Clean up the response
@@ -133,20 +500,55 @@ class RAGPipeline:
             'confidence': 'high' if has_citations else 'low'
         }
 
+# Exact-match answer cache: identical (query, mode) pairs skip retrieval
+# and the LLM round-trip entirely
+_ANSWER_CACHE = OrderedDict()
+_ANSWER_CACHE_MAXSIZE = 1024
+_ANSWER_CACHE_LOCK = threading.Lock()
+
+
+def _answer_cache_get(key):
+    with _ANSWER_CACHE_LOCK:
+        if key in _ANSWER_CACHE:
+            _ANSWER_CACHE.move_to_end(key)
+            return dict(_ANSWER_CACHE[key])
+    return None
+
+
+def _answer_cache_put(key, result):
+    with _ANSWER_CACHE_LOCK:
+        _ANSWER_CACHE[key] = dict(result)
+        if len(_ANSWER_CACHE) > _ANSWER_CACHE_MAXSIZE:
+            _ANSWER_CACHE.popitem(last=False)
+
+
+# Shared default pipeline: constructing RAGPipeline per call would build a
+# fresh OpenAI client (and its connection pool) on every query
+_DEFAULT_RAG = None
+
+
+def _get_default_rag():
+    global _DEFAULT_RAG
+    if _DEFAULT_RAG is None:
+        _DEFAULT_RAG = RAGPipeline(api_key=OPENAI_API_KEY)
+    return _DEFAULT_RAG
+
+
 # Standalone function for simple usage
 def answer_question_with_citations(query: str, mode: str = "normal") -> Dict:
     """Simple interface for generating cited answers"""
     try:
-        rag = RAGPipeline(api_key=OPENAI_API_KEY)
+        cache_key = (query.strip().lower(), mode)
+        cached = _answer_cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        rag = _get_default_rag()
         result = rag.generate_answer_with_citations(query, mode=mode)
+        # Never cache failures: the cache has no TTL, so a transient outage
+        # would otherwise poison this (query, mode) key for the process life
+        if result.get('confidence') != 'error':
+            _answer_cache_put(cache_key, result)
         return result
     except Exception as e:
-        return {
-            'answer': f"Error generating answer: {str(e)}",
-            'has_citations': False,
-            'citations_used': [],
-            'citation_map': {},
-            'query': query,
-            'sources_count': 0,
-            'confidence': 'error'
-        }
\ No newline at end of file
+        return _error_answer(query, e)
\ No newline at end of file
@@ -1,46 +1,165 @@
+import functools
+import logging
+import os
+import httpx
 from backend.embeddings import EmbeddingManager
 
-def retrieve_relevant_chunks(query, top_k=5):
-    # Create EmbeddingManager instance
-    embedding_manager = EmbeddingManager()
-
-    #Checking if embeddings are available
-    try:
-        all_docs = embedding_manager.collection.get()
-        print(f"Total documents in collection: {len(all_docs['documents'])}")
-    except:
-        print("Error accessing collection")
-    
+logger = logging.getLogger(__name__)
+
+# Shared manager: constructing one per query would reopen the Chroma
+# collection (and potentially reload the model) on every request
+_EM = None
+
+# Remote mode: when RETRIEVAL_SERVICE_URL points at a running
+# api.retrieval_service instance, retrieval becomes an HTTP POST and this
+# process never loads its own model, Chroma client or caches
+_SERVICE_CLIENT = None
+
+
+def _service_url():
+    return os.environ.get("RETRIEVAL_SERVICE_URL", "").rstrip("/")
+
+
+def _retrieve_remote(path, payload):
+    global _SERVICE_CLIENT
+    if _SERVICE_CLIENT is None:
+        _SERVICE_CLIENT = httpx.Client(timeout=30.0)
+    response = _SERVICE_CLIENT.post(f"{_service_url()}{path}", json=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+def _get_em():
+    global _EM
+    if _EM is None:
+        _EM = EmbeddingManager()
+        # One-shot availability check at startup, not per query; count()
+        # is O(1) where the old collection.get() pulled every document
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Total chunks in collection: %d", _EM.collection.count())
+    return _EM
+
+
+# Token counting for the context budget: exact with tiktoken when
+# installed, else the ~4 chars/token approximation
+try:
+    import tiktoken
+    _TOKEN_ENCODER = tiktoken.get_encoding("cl100k_base")
+
+    def _count_tokens(text):
+        return len(_TOKEN_ENCODER.encode(text))
+except ImportError:
+    def _count_tokens(text):
+        return len(text) // 4
+
+
+def _budget_chunks(search_results, max_context_tokens):
+    """Keep chunks in rank order until the token budget runs out.
+
+    Prompt prefill cost grows superlinearly with context length, so capping
+    the context bounds both latency and spend. Always keeps the top chunk.
+    """
+    kept = []
+    used = 0
+    for result in search_results:
+        cost = _count_tokens(result['content'])
+        if kept and used + cost > max_context_tokens:
+            break
+        kept.append(result)
+        used += cost
+    return kept
+
+
+def retrieve_relevant_chunks(query, top_k=5, max_context_tokens=2000):
+    if _service_url():
+        context = _retrieve_remote("/retrieve", {
+            'query': query, 'top_k': top_k, 'max_context_tokens': max_context_tokens
+        })
+        # The vector stays on the service side; callers treat None as
+        # "no embedding available" and skip embedding-keyed caches
+        context['query_embedding'] = None
+        return context
+
+    embedding_manager = _get_em()
+
+    # Embed the query once; search and any downstream semantic caching
+    # share the same vector
+    query_embedding = embedding_manager._embed_query(query)
+
     # Get search results (this returns a list of dictionaries)
-    search_results = embedding_manager.search_similar(query, top_k)
-    
-    # Format context and extract citations
-    formatted_context = format_context_with_citations(search_results)
-    citation_map = extract_citation_info(search_results)
-    
+    search_results = embedding_manager.search_similar(query, top_k, query_embedding=query_embedding)
+    if max_context_tokens:
+        search_results = _budget_chunks(search_results, max_context_tokens)
+
+    # Format context and extract citations in one pass
+    formatted_context, citation_map = _format_results(search_results)
+
     return {
         'query': query,
+        'query_embedding': query_embedding,
         'context_chunks': search_results,
         'formatted_context': formatted_context,
         'citation_map': citation_map
     }
-    
-    
-#To transform the output so it is accessible to LLM        
-def format_context_with_citations(search_results):
-    formatted_context = []
-    for i, result in enumerate(search_results, start=1):
-        page_number = result.get('metadata', {}).get('page_number')
-        content = result.get('content')
-        formatted_context.append(f"Source {i} (Page {page_number}): {content}")
-    return "\n".join(formatted_context)
 
-#To extract citation info from metadata
-def extract_citation_info(search_results):
+
+
+def retrieve_relevant_chunks_batch(queries, top_k=5, max_context_tokens=2000):
+    """Retrieve contexts for many queries at once.
+
+    Embeds all queries in one encode and searches them in one vector-store
+    call, then formats each context as retrieve_relevant_chunks would.
+    Returns one context dict per query, in order.
+    """
+    if _service_url():
+        contexts = _retrieve_remote("/retrieve_batch", {
+            'queries': list(queries), 'top_k': top_k,
+            'max_context_tokens': max_context_tokens
+        })
+        for context in contexts:
+            context['query_embedding'] = None
+        return contexts
+
+    embedding_manager = _get_em()
+
+    query_embeddings = embedding_manager._embed_queries(list(queries))
+    batch_results = embedding_manager.search_similar_batch(
+        queries, top_k, query_embeddings=query_embeddings
+    )
+    if max_context_tokens:
+        batch_results = [_budget_chunks(r, max_context_tokens) for r in batch_results]
+
+    contexts = []
+    for query, query_embedding, search_results in zip(queries, query_embeddings, batch_results):
+        formatted_context, citation_map = _format_results(search_results)
+        contexts.append({
+            'query': query,
+            'query_embedding': query_embedding,
+            'context_chunks': search_results,
+            'formatted_context': formatted_context,
+            'citation_map': citation_map
+        })
+    return contexts
+
+
+@functools.lru_cache(maxsize=4096)
+def _reference_string(filename, page_number):
+    """Citation reference for one chunk; the same (file, page) recurs
+    across queries, so build the string once"""
+    return f"{filename}, Page {page_number}"
+
+
+#To transform the output so it is accessible to LLM
+def _format_results(search_results):
+    """One pass over the results building both the LLM-facing context
+    block and the source -> reference citation map"""
+    formatted_context = []
     citation_map = {}
     for i, result in enumerate(search_results, start=1):
         metadata = result.get('metadata', {})
-        filename = metadata.get('filename', 'Unknown')
         page_number = metadata.get('page_number', 'Unknown')
-        citation_map[f"Source {i}"] = f"{filename}, Page {page_number}"
-    return citation_map
\ No newline at end of file
+        formatted_context.append(f"Source {i} (Page {page_number}): {result.get('content')}")
+        citation_map[f"Source {i}"] = _reference_string(
+            metadata.get('filename', 'Unknown'), page_number
+        )
+    return "\n".join(formatted_context), citation_map
\ No newline at end of file
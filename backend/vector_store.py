@@ -0,0 +1,159 @@
+# Optional FAISS vector-store backend
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+
+class FaissStore:
+    """FAISS-backed alternative to the Chroma collection for large corpora.
+
+    Exposes the subset of the Chroma collection interface EmbeddingManager
+    uses (upsert/add/query/get/delete), so it can be dropped in via the
+    VECTOR_BACKEND=faiss setting. Vectors live in an HNSW index persisted
+    with faiss.write_index; documents and metadata live in a SQLite
+    sidecar keyed by vector row.
+
+    By default the index is opened writable for ingest. Query-only
+    processes can pass read_only=True to memory-map it instead, keeping
+    the vectors on disk rather than resident in RAM — an mmap-opened
+    FAISS index must never be added to, so upsert refuses in that mode.
+
+    Vectors must be unit-norm (as generate_embeddings produces), so inner
+    product equals cosine and distances are reported as 1 - ip, matching
+    the Chroma ip space.
+    """
+
+    def __init__(self, db_path, dim=384, m=32, read_only=False, flush_every=1):
+        import faiss
+        self.faiss = faiss
+        self.dim = dim
+        self.read_only = read_only
+        # faiss.write_index rewrites the whole index — O(N) per flush — so
+        # bulk ingests should raise flush_every and call flush() at the end
+        self.flush_every = max(1, flush_every)
+        self._pending_flushes = 0
+
+        os.makedirs(db_path, exist_ok=True)
+        self.index_path = os.path.join(db_path, "faiss_hnsw.index")
+        self.conn = sqlite3.connect(os.path.join(db_path, "faiss_meta.sqlite3"), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            "row INTEGER PRIMARY KEY, id TEXT, document TEXT, metadata TEXT, deleted INTEGER DEFAULT 0)"
+        )
+        self.conn.commit()
+
+        if os.path.exists(self.index_path):
+            if read_only:
+                self.index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP)
+            else:
+                self.index = faiss.read_index(self.index_path)
+        else:
+            self.index = faiss.IndexHNSWFlat(dim, m, faiss.METRIC_INNER_PRODUCT)
+
+    def upsert(self, documents, metadatas, ids, embeddings):
+        """Append rows to the index and sidecar.
+
+        HNSW cannot replace vectors in place, so a re-written id gets a new
+        row and its old row is tombstoned; query filters tombstones out.
+        """
+        if self.read_only:
+            raise RuntimeError("FaissStore opened read_only (mmap); reopen writable to ingest")
+
+        existing = {
+            row_id for (row_id,) in self.conn.execute(
+                "SELECT id FROM rows WHERE id IN (%s) AND deleted = 0"
+                % ",".join("?" * len(ids)), list(ids)
+            )
+        }
+        if existing:
+            self.conn.executemany(
+                "UPDATE rows SET deleted = 1 WHERE id = ? AND deleted = 0",
+                [(row_id,) for row_id in existing]
+            )
+
+        start_row = int(self.index.ntotal)
+        vectors = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+        self.index.add(vectors)
+
+        self.conn.executemany(
+            "INSERT INTO rows (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+            [
+                (start_row + i, ids[i], documents[i], json.dumps(metadatas[i]))
+                for i in range(len(ids))
+            ]
+        )
+        self.conn.commit()
+        self._pending_flushes += 1
+        if self._pending_flushes >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Persist the index to disk (full rewrite, O(N))"""
+        if self.read_only:
+            return
+        self.faiss.write_index(self.index, self.index_path)
+        self._pending_flushes = 0
+
+    # Chroma compatibility: add behaves like upsert here
+    add = upsert
+
+    def query(self, query_embeddings, n_results=5, where=None, **kwargs):
+        """Nearest-neighbor search returning Chroma-shaped result lists"""
+        query = np.ascontiguousarray(np.asarray(query_embeddings, dtype=np.float32))
+        # Overfetch to ride out tombstoned rows and metadata filters
+        scores, rows = self.index.search(query, min(int(self.index.ntotal), n_results * 4) or 1)
+
+        documents, metadatas, distances = [], [], []
+        for q in range(len(query)):
+            q_docs, q_metas, q_dists = [], [], []
+            for score, row in zip(scores[q], rows[q]):
+                if row < 0 or len(q_docs) >= n_results:
+                    continue
+                found = self.conn.execute(
+                    "SELECT document, metadata FROM rows WHERE row = ? AND deleted = 0", (int(row),)
+                ).fetchone()
+                if found is None:
+                    continue
+                metadata = json.loads(found[1])
+                if where and any(metadata.get(k) != v for k, v in where.items()):
+                    continue
+                q_docs.append(found[0])
+                q_metas.append(metadata)
+                q_dists.append(1.0 - float(score))
+            documents.append(q_docs)
+            metadatas.append(q_metas)
+            distances.append(q_dists)
+
+        return {'documents': documents, 'metadatas': metadatas, 'distances': distances}
+
+    def get(self, ids, include=None, **kwargs):
+        """Fetch rows by id, mirroring Chroma's get shape"""
+        documents, metadatas = [], []
+        for row_id in ids:
+            found = self.conn.execute(
+                "SELECT document, metadata FROM rows WHERE id = ? AND deleted = 0", (row_id,)
+            ).fetchone()
+            if found is not None:
+                documents.append(found[0])
+                metadatas.append(json.loads(found[1]))
+        return {'ids': list(ids), 'documents': documents, 'metadatas': metadatas}
+
+    def delete(self, where=None, ids=None, **kwargs):
+        """Tombstone rows by id or metadata equality filter"""
+        if ids:
+            self.conn.executemany(
+                "UPDATE rows SET deleted = 1 WHERE id = ?", [(row_id,) for row_id in ids]
+            )
+        elif where:
+            for (row, metadata) in self.conn.execute(
+                "SELECT row, metadata FROM rows WHERE deleted = 0"
+            ).fetchall():
+                if all(json.loads(metadata).get(k) == v for k, v in where.items()):
+                    self.conn.execute("UPDATE rows SET deleted = 1 WHERE row = ?", (row,))
+        self.conn.commit()
+
+    def count(self):
+        row = self.conn.execute("SELECT COUNT(*) FROM rows WHERE deleted = 0").fetchone()
+        return int(row[0])